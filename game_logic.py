@@ -4,43 +4,184 @@ Gomoku game logic
 """
 
 from typing import List, Tuple, Optional, Dict, Any
+from array import array
 import json
-import copy
+import random
 from config import BOARD_SIZE, WIN_LENGTH, PLAYER_SYMBOL, AI_SYMBOL, EMPTY_SYMBOL
 
+# NumPy为可选加速依赖：可用时全棋盘扫描走C层向量运算，不可用时走纯Python路径
+try:
+    import numpy as _np
+except ImportError:  # pragma: no cover
+    _np = None
+
+
+_CELL_COUNT = BOARD_SIZE * BOARD_SIZE
+
+
+def _build_lines_through():
+    """为每个格子预计算4个方向上经过它的扫描线（扁平索引，已按棋盘边界裁剪）
+
+    每个方向给出 (正向索引, 反向索引) 两个元组，各最多 WIN_LENGTH-1 个格子，
+    运行时扫描无需再做边界检查。
+    """
+    lines = []
+    for r in range(BOARD_SIZE):
+        for c in range(BOARD_SIZE):
+            dirs = []
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                sides = []
+                for sign in (1, -1):
+                    side = []
+                    rr, cc = r + sign * dr, c + sign * dc
+                    for _ in range(WIN_LENGTH - 1):
+                        if not (0 <= rr < BOARD_SIZE and 0 <= cc < BOARD_SIZE):
+                            break
+                        side.append(rr * BOARD_SIZE + cc)
+                        rr += sign * dr
+                        cc += sign * dc
+                    sides.append(tuple(side))
+                dirs.append(tuple(sides))
+            lines.append(tuple(dirs))
+    return tuple(lines)
+
+
+# 索引为 row*BOARD_SIZE+col，在模块加载时构建一次
+_LINES_THROUGH = _build_lines_through()
+
+# Zobrist键：每个(格子, 玩家)一个64位随机数，固定种子保证进程间键一致
+_zobrist_rng = random.Random(0x476F6D6F6B75)  # "Gomoku"
+_ZOBRIST = [
+    (_zobrist_rng.getrandbits(64), _zobrist_rng.getrandbits(64))
+    for _ in range(_CELL_COUNT)
+]
+del _zobrist_rng
+
+# 胜负检查的置换表缓存：同一局面+落子的检查结果在回溯式推演中会反复出现
+_WIN_CACHE: Dict[Tuple[int, int, int], bool] = {}
+_WIN_CACHE_LIMIT = 1 << 16
+
+# Numba同样为可选加速依赖：可用时胜负扫描下沉为nopython内核
+try:
+    from numba import njit as _njit
+except ImportError:  # pragma: no cover
+    _njit = None
+
+if _np is not None and _njit is not None:
+    @_njit(cache=True, nogil=True)
+    def _check_winner_nb(flat, row, col, player, win_len, size):
+        """nopython胜负扫描内核，逻辑与纯Python版check_winner一致"""
+        for k in range(4):
+            if k == 0:
+                dr, dc = 0, 1
+            elif k == 1:
+                dr, dc = 1, 0
+            elif k == 2:
+                dr, dc = 1, 1
+            else:
+                dr, dc = 1, -1
+            count = 1
+            r, c = row + dr, col + dc
+            while 0 <= r < size and 0 <= c < size and flat[r * size + c] == player:
+                count += 1
+                r += dr
+                c += dc
+            r, c = row - dr, col - dc
+            while 0 <= r < size and 0 <= c < size and flat[r * size + c] == player:
+                count += 1
+                r -= dr
+                c -= dc
+            if count >= win_len:
+                return True
+        return False
+
+    # 导入时用空棋盘触发一次编译，避免首步落子付出JIT延迟
+    _check_winner_nb(
+        _np.zeros(BOARD_SIZE * BOARD_SIZE, dtype=_np.int8),
+        0, 0, PLAYER_SYMBOL, WIN_LENGTH, BOARD_SIZE,
+    )
+else:
+    _check_winner_nb = None
+
 
 class GomokuGame:
     """五子棋游戏类"""
-    
+
+    __slots__ = (
+        "current_player", "game_over", "winner",
+        "move_rows", "move_cols", "move_players",
+        "flat", "_empties", "_filled", "zhash", "_json_cache",
+    )
+
     def __init__(self):
-        self.board = [[EMPTY_SYMBOL for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
         self.current_player = PLAYER_SYMBOL  # 玩家先手
         self.game_over = False
         self.winner = None
-        self.move_history = []
-    
+        # 移动历史按SoA存储：三个并行字节数组，每步3字节而非一个字典
+        self.move_rows = array('b')
+        self.move_cols = array('b')
+        self.move_players = array('b')
+        # 扁平连续字节数组是唯一权威棋盘存储，索引为 row*BOARD_SIZE+col
+        self.flat = array('b', bytes(_CELL_COUNT))
+        # 增量维护的空位集合与落子计数，避免热路径上的全盘扫描
+        self._empties = {(i, j) for i in range(BOARD_SIZE) for j in range(BOARD_SIZE)}
+        self._filled = 0
+        self.zhash = 0  # 局面的Zobrist哈希，随落子增量更新
+        # to_json()的记忆化结果；None表示局面已变化需要重建
+        self._json_cache: Optional[Dict[str, Any]] = None
+
     def reset_game(self):
         """重置游戏"""
-        self.board = [[EMPTY_SYMBOL for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
         self.current_player = PLAYER_SYMBOL
         self.game_over = False
         self.winner = None
-        self.move_history = []
-    
+        self.move_rows = array('b')
+        self.move_cols = array('b')
+        self.move_players = array('b')
+        self.flat = array('b', bytes(_CELL_COUNT))
+        self._empties = {(i, j) for i in range(BOARD_SIZE) for j in range(BOARD_SIZE)}
+        self._filled = 0
+        self.zhash = 0
+        self._json_cache = None
+
+    @property
+    def board(self) -> List[List[int]]:
+        """以嵌套列表形式呈现棋盘（JSON兼容视图，按需构建）"""
+        flat = self.flat
+        return [
+            list(flat[i * BOARD_SIZE:(i + 1) * BOARD_SIZE])
+            for i in range(BOARD_SIZE)
+        ]
+
+    @property
+    def move_history(self) -> List[Dict[str, int]]:
+        """以字典列表形式呈现移动历史（JSON兼容视图，按需构建）"""
+        return [
+            {"row": r, "col": c, "player": p}
+            for r, c, p in zip(self.move_rows, self.move_cols, self.move_players)
+        ]
+
     def is_valid_move(self, row: int, col: int) -> bool:
         """检查移动是否有效"""
         if not (0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE):
             return False
-        return self.board[row][col] == EMPTY_SYMBOL
-    
+        return self.flat[row * BOARD_SIZE + col] == EMPTY_SYMBOL
+
     def make_move(self, row: int, col: int, player: int) -> bool:
         """执行移动"""
         if not self.is_valid_move(row, col) or self.game_over:
             return False
-        
-        self.board[row][col] = player
-        self.move_history.append({"row": row, "col": col, "player": player})
-        
+
+        idx = row * BOARD_SIZE + col
+        self.flat[idx] = player
+        self.zhash ^= _ZOBRIST[idx][player - 1]
+        self._empties.discard((row, col))
+        self._filled += 1
+        self.move_rows.append(row)
+        self.move_cols.append(col)
+        self.move_players.append(player)
+        self._json_cache = None
+
         # 检查是否获胜
         if self.check_winner(row, col, player):
             self.game_over = True
@@ -55,55 +196,55 @@ class GomokuGame:
         return True
     
     def check_winner(self, row: int, col: int, player: int) -> bool:
-        """检查是否有玩家获胜"""
-        directions = [
-            (0, 1),   # 水平
-            (1, 0),   # 垂直
-            (1, 1),   # 主对角线
-            (1, -1)   # 副对角线
-        ]
-        
-        for dr, dc in directions:
+        """检查是否有玩家获胜（只扫描经过最后落子的4条线，结果按局面哈希缓存）"""
+        key = (self.zhash, row * BOARD_SIZE + col, player)
+        cached = _WIN_CACHE.get(key)
+        if cached is not None:
+            return cached
+        result = self._scan_winner(row, col, player)
+        if len(_WIN_CACHE) >= _WIN_CACHE_LIMIT:
+            _WIN_CACHE.clear()
+        _WIN_CACHE[key] = result
+        return result
+
+    def _scan_winner(self, row: int, col: int, player: int) -> bool:
+        """实际的4方向扫描（索引已预裁剪）"""
+        if _check_winner_nb is not None:
+            view = _np.frombuffer(self.flat, dtype=_np.int8)
+            return bool(_check_winner_nb(view, row, col, player, WIN_LENGTH, BOARD_SIZE))
+        flat = self.flat
+        for forward, backward in _LINES_THROUGH[row * BOARD_SIZE + col]:
             count = 1  # 包含当前棋子
-            
-            # 向一个方向检查
-            r, c = row + dr, col + dc
-            while (0 <= r < BOARD_SIZE and 0 <= c < BOARD_SIZE and 
-                   self.board[r][c] == player):
+            for idx in forward:
+                if flat[idx] != player:
+                    break
                 count += 1
-                r, c = r + dr, c + dc
-            
-            # 向相反方向检查
-            r, c = row - dr, col - dc
-            while (0 <= r < BOARD_SIZE and 0 <= c < BOARD_SIZE and 
-                   self.board[r][c] == player):
+            for idx in backward:
+                if flat[idx] != player:
+                    break
                 count += 1
-                r, c = r - dr, c - dc
-            
             if count >= WIN_LENGTH:
                 return True
-        
         return False
-    
+
     def is_board_full(self) -> bool:
         """检查棋盘是否已满"""
-        for row in self.board:
-            if EMPTY_SYMBOL in row:
-                return False
-        return True
+        return self._filled == _CELL_COUNT
     
     def get_empty_positions(self) -> List[Tuple[int, int]]:
         """获取所有空位置"""
-        positions = []
-        for i in range(BOARD_SIZE):
-            for j in range(BOARD_SIZE):
-                if self.board[i][j] == EMPTY_SYMBOL:
-                    positions.append((i, j))
-        return positions
+        return list(self._empties)
     
     def to_json(self) -> Dict[str, Any]:
-        """将游戏状态转换为JSON格式"""
-        return {
+        """将游戏状态转换为JSON格式
+
+        结果按局面记忆化：轮询状态的请求在两次落子之间拿到同一个dict，
+        免去每次的全盘遍历。调用方如需添加字段应先浅拷贝，勿原地修改。
+        """
+        cached = self._json_cache
+        if cached is not None:
+            return cached
+        state = {
             "board": self.board,
             "current_player": self.current_player,
             "game_over": self.game_over,
@@ -111,31 +252,70 @@ class GomokuGame:
             "move_history": self.move_history,
             "board_size": BOARD_SIZE
         }
+        self._json_cache = state
+        return state
     
     def from_json(self, data: Dict[str, Any]):
         """从JSON格式恢复游戏状态"""
-        self.board = data["board"]
         self.current_player = data["current_player"]
         self.game_over = data["game_over"]
         self.winner = data["winner"]
-        self.move_history = data["move_history"]
+        self._json_cache = None
+        self.move_rows = array('b', (m["row"] for m in data["move_history"]))
+        self.move_cols = array('b', (m["col"] for m in data["move_history"]))
+        self.move_players = array('b', (m["player"] for m in data["move_history"]))
+        # 从传入棋盘重建扁平棋盘和增量状态（逐格写入，不与调用方共享存储）
+        self.flat = array('b', bytes(_CELL_COUNT))
+        self._empties = set()
+        self._filled = 0
+        self.zhash = 0
+        for i, board_row in enumerate(data["board"]):
+            for j, cell in enumerate(board_row):
+                if cell == EMPTY_SYMBOL:
+                    self._empties.add((i, j))
+                else:
+                    idx = i * BOARD_SIZE + j
+                    self.flat[idx] = cell
+                    self.zhash ^= _ZOBRIST[idx][cell - 1]
+                    self._filled += 1
     
+    # 紧凑表示：每格1个字符，提示词中的棋盘Token量约降为原来的1/3；
+    # 棋子值到字符的转换用字节翻译表在C层一次完成，免去225次Python级查表
+    _SYMBOL_TABLE = bytes.maketrans(
+        bytes([EMPTY_SYMBOL, PLAYER_SYMBOL, AI_SYMBOL]), b".XO"
+    )
+    # 行号前缀固定不变，类加载时构建一次
+    _ROW_PREFIXES = tuple(f"{i:2d} " for i in range(BOARD_SIZE))
+    # 列标题用十位/个位两行表示，不随棋局变化，类加载时构建一次
+    _HEADER = (
+        "   " + "".join(str(i // 10) for i in range(BOARD_SIZE)) + "\n"
+        "   " + "".join(str(i % 10) for i in range(BOARD_SIZE)) + "\n"
+    )
+
     def get_board_string(self) -> str:
         """获取棋盘的字符串表示，用于LLM理解"""
-        board_str = "当前棋盘状态 (0=空位, 1=玩家, 2=AI):\n"
-        board_str += "   " + " ".join([f"{i:2d}" for i in range(BOARD_SIZE)]) + "\n"
-        
-        for i, row in enumerate(self.board):
-            board_str += f"{i:2d} " + " ".join([f"{cell:2d}" for cell in row]) + "\n"
-        
-        return board_str
+        # 整盘一次翻译成ASCII字符，循环里只做切片和拼接
+        rendered = bytes(self.flat).translate(self._SYMBOL_TABLE)
+        parts = ["当前棋盘状态 (.=空位, X=玩家, O=AI)，左侧为行号，顶部两行为列号(十位/个位):\n",
+                 self._HEADER]
+        for i in range(BOARD_SIZE):
+            parts.append(self._ROW_PREFIXES[i])
+            parts.append(rendered[i * BOARD_SIZE:(i + 1) * BOARD_SIZE].decode("ascii"))
+            parts.append("\n")
+        return "".join(parts)
     
     def clone(self) -> 'GomokuGame':
         """创建游戏状态的副本"""
         new_game = GomokuGame()
-        new_game.board = copy.deepcopy(self.board)
         new_game.current_player = self.current_player
         new_game.game_over = self.game_over
         new_game.winner = self.winner
-        new_game.move_history = copy.deepcopy(self.move_history)
+        new_game.move_rows = array('b', self.move_rows)
+        new_game.move_cols = array('b', self.move_cols)
+        new_game.move_players = array('b', self.move_players)
+        new_game.flat = array('b', self.flat)
+        new_game._empties = set(self._empties)
+        new_game._filled = self._filled
+        new_game.zhash = self.zhash
+        new_game._json_cache = None
         return new_game
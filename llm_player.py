@@ -3,9 +3,15 @@ LLM 玩家逻辑
 LLM player logic supporting multiple providers (Gemini and LMStudio)
 """
 
-import json
 import logging
 import time
+from collections import deque
+
+# orjson解析比标准库快2-3倍，可用时优先；接口兼容loads调用
+try:
+    import orjson as _json
+except ImportError:  # pragma: no cover
+    import json as _json
 from typing import Dict, Any, Tuple, Optional
 from gemini_api import GeminiAPI
 from lmstudio_adapter import LMStudioAdapter
@@ -21,10 +27,23 @@ from config import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 所有坐标按到棋盘中心的曼哈顿距离预排序，备用策略按此顺序取第一个空位
+_CENTER_ORDER = sorted(
+    ((r, c) for r in range(BOARD_SIZE) for c in range(BOARD_SIZE)),
+    key=lambda p: abs(p[0] - BOARD_SIZE // 2) + abs(p[1] - BOARD_SIZE // 2),
+)
+
 
 class LLMPlayer:
     """LLM 驱动的五子棋玩家，支持多种LLM提供商"""
 
+    __slots__ = (
+        "provider", "llm_client", "model", "chat_session",
+        "conversation_count", "last_ai_move",
+        "total_game_tokens", "_last_session_tokens", "_has_token_usage",
+        "debug_info",
+    )
+
     def __init__(self):
         self.provider = LLM_PROVIDER.lower()
         self.llm_client = None
@@ -38,19 +57,19 @@ class LLMPlayer:
             "output_tokens": 0,
             "total_tokens": 0
         }
-        # 记录上次累计的会话Token数量，避免重复计算
-        self._last_session_tokens = {
-            "input_tokens": 0,
-            "output_tokens": 0
-        }
-
-        # 调试信息记录
-        self.debug_info = {
-            "last_request": None,
-            "last_response": None,
-            "last_request_time": 0,
-            "request_history": []  # 保存最近的几次请求响应记录
-        }
+        # 记录上次累计的会话Token数量 (input, output)，避免重复计算
+        self._last_session_tokens = (0, 0)
+
+        # 调试信息记录（调试模式关闭时完全不维护，省去每回合的字典写入）
+        if DEBUG_MODE:
+            self.debug_info = {
+                "last_request": None,
+                "last_response": None,
+                "last_request_time": 0,
+                "request_history": deque(maxlen=5)  # 保存最近的几次请求响应记录，自动淘汰
+            }
+        else:
+            self.debug_info = None
 
         self._init_llm_client()
         self._init_chat_session()
@@ -86,11 +105,10 @@ class LLMPlayer:
         )
         self.conversation_count = 0
         self.last_ai_move = None  # 重置最新落子记录
+        # 会话对象固定后缓存一次能力检查，热路径无需重复hasattr
+        self._has_token_usage = hasattr(self.chat_session, 'get_token_usage')
         # 重置会话Token记录
-        self._last_session_tokens = {
-            "input_tokens": 0,
-            "output_tokens": 0
-        }
+        self._last_session_tokens = (0, 0)
         logger.info(f"LLM chat session initialized with {self.provider}")
     
     def _manage_conversation_history(self):
@@ -104,31 +122,32 @@ class LLMPlayer:
 
     def _accumulate_token_usage(self):
         """累计当前会话的Token使用量到游戏总计中"""
-        if self.chat_session and hasattr(self.chat_session, 'get_token_usage'):
-            session_usage = self.chat_session.get_token_usage()
-
-            # 获取当前会话的总Token使用量
-            session_input_tokens = session_usage.get("total_input_tokens", 0)
-            session_output_tokens = session_usage.get("total_output_tokens", 0)
-
-            # 计算新增的Token使用量（当前会话总量 - 上次记录的量）
-            new_input_tokens = session_input_tokens - self._last_session_tokens["input_tokens"]
-            new_output_tokens = session_output_tokens - self._last_session_tokens["output_tokens"]
-
-            # 累计到游戏总计中
-            self.total_game_tokens["input_tokens"] += new_input_tokens
-            self.total_game_tokens["output_tokens"] += new_output_tokens
-            self.total_game_tokens["total_tokens"] = (
-                self.total_game_tokens["input_tokens"] +
-                self.total_game_tokens["output_tokens"]
-            )
+        if not self._has_token_usage:
+            return
+
+        # 两种会话实现的get_token_usage契约都保证这两个键存在
+        session_usage = self.chat_session.get_token_usage()
+        session_input_tokens = session_usage["total_input_tokens"]
+        session_output_tokens = session_usage["total_output_tokens"]
+
+        # 计算新增的Token使用量（当前会话总量 - 上次记录的量）
+        last_input_tokens, last_output_tokens = self._last_session_tokens
+        new_input_tokens = session_input_tokens - last_input_tokens
+        new_output_tokens = session_output_tokens - last_output_tokens
+
+        # 累计到游戏总计中
+        self.total_game_tokens["input_tokens"] += new_input_tokens
+        self.total_game_tokens["output_tokens"] += new_output_tokens
+        self.total_game_tokens["total_tokens"] = (
+            self.total_game_tokens["input_tokens"] +
+            self.total_game_tokens["output_tokens"]
+        )
 
-            # 更新上次记录的会话Token数量
-            self._last_session_tokens["input_tokens"] = session_input_tokens
-            self._last_session_tokens["output_tokens"] = session_output_tokens
+        # 更新上次记录的会话Token数量（整体替换，保持原子性）
+        self._last_session_tokens = (session_input_tokens, session_output_tokens)
 
-            if new_input_tokens > 0 or new_output_tokens > 0:
-                logger.info(f"Token usage - New: +{new_input_tokens}(in) +{new_output_tokens}(out), Total: {self.total_game_tokens['total_tokens']}")
+        if new_input_tokens > 0 or new_output_tokens > 0:
+            logger.info(f"Token usage - New: +{new_input_tokens}(in) +{new_output_tokens}(out), Total: {self.total_game_tokens['total_tokens']}")
 
     def reset_token_usage(self):
         """重置Token使用量统计（游戏重置时调用）"""
@@ -137,12 +156,24 @@ class LLMPlayer:
             "output_tokens": 0,
             "total_tokens": 0
         }
-        self._last_session_tokens = {
-            "input_tokens": 0,
-            "output_tokens": 0
-        }
+        self._last_session_tokens = (0, 0)
         logger.info("Token usage statistics reset")
-    
+
+    def reset(self):
+        """就地重置玩家状态（新开一局时调用）
+
+        只重建聊天会话并清零统计，保留LLM客户端实例——
+        客户端持有的HTTP连接池跨局复用，重置后首步免去重新握手。
+        """
+        self._init_chat_session()
+        self.reset_token_usage()
+        if DEBUG_MODE:
+            self.debug_info["last_request"] = None
+            self.debug_info["last_response"] = None
+            self.debug_info["last_request_time"] = 0
+            self.debug_info["request_history"].clear()
+        logger.info("LLM player reset in place (client and connection pool kept)")
+
     def get_move(self, game: GomokuGame) -> Tuple[Optional[int], Optional[int], str]:
         """
         获取LLM的下棋决策
@@ -185,10 +216,10 @@ class LLMPlayer:
             # 计算请求时间
             end_time = time.time()
             request_time = end_time - start_time
-            self.debug_info["last_request_time"] = request_time
 
             # 记录调试信息 - 响应
             if DEBUG_MODE:
+                self.debug_info["last_request_time"] = request_time
                 self.debug_info["last_response"] = {
                     "timestamp": end_time,
                     "response": response,
@@ -196,13 +227,19 @@ class LLMPlayer:
                 }
 
                 # 保存到历史记录（最多保留最近5次）
-                debug_record = {
-                    "request": self.debug_info["last_request"].copy(),
-                    "response": self.debug_info["last_response"].copy()
-                }
-                self.debug_info["request_history"].append(debug_record)
-                if len(self.debug_info["request_history"]) > 5:
-                    self.debug_info["request_history"].pop(0)
+                # 只记录轻量摘要：完整请求/响应载荷仅保留最新一次
+                # （前端调试窗口也只渲染last_request/last_response）
+                response_text = ""
+                if response.get("candidates"):
+                    parts_list = response["candidates"][0].get("content", {}).get("parts", [])
+                    if parts_list:
+                        response_text = parts_list[0].get("text", "")
+                self.debug_info["request_history"].append({
+                    "timestamp": start_time,
+                    "prompt_chars": len(prompt),
+                    "response_chars": len(response_text),
+                    "request_time": request_time
+                })
 
             # 累计Token使用量
             self._accumulate_token_usage()
@@ -229,30 +266,32 @@ class LLMPlayer:
             logger.error(f"Error getting LLM move: {e}")
             return self._fallback_move(game)
     
-    def _build_prompt(self, game: GomokuGame) -> str:
-        """构建发送给LLM的提示词"""
-        prompt = f"""请分析以下五子棋局面并选择你的下一步棋：
-
-{game.get_board_string()}
+    # 提示词中不随棋局变化的部分，类加载时构建一次
+    _PROMPT_HEADER = "请分析以下五子棋局面并选择你的下一步棋：\n\n"
+    _PROMPT_MID = """
 
 游戏信息：
-- 你是AI玩家，使用棋子2
-- 对手是人类玩家，使用棋子1
+- 你是AI玩家，使用棋子 O
+- 对手是人类玩家，使用棋子 X
 - 当前轮到你下棋
 - 目标：连成5子获胜
 
 最近的移动历史：
 """
-        
-        # 添加最近几步的移动历史
-        recent_moves = game.move_history[-6:] if len(game.move_history) > 6 else game.move_history
-        for i, move in enumerate(recent_moves):
-            player_name = "玩家" if move["player"] == PLAYER_SYMBOL else "AI"
-            prompt += f"{i+1}. {player_name} 在 ({move['row']}, {move['col']}) 下棋\n"
-        
-        prompt += "\n请仔细分析局面，选择最佳位置下棋。记住必须选择空位(值为0)！"
-        
-        return prompt
+    _PROMPT_TAIL = "\n请仔细分析局面，选择最佳位置下棋。记住必须选择空位(标记为.)！"
+
+    def _build_prompt(self, game: GomokuGame) -> str:
+        """构建发送给LLM的提示词"""
+        parts = [self._PROMPT_HEADER, game.get_board_string(), self._PROMPT_MID]
+
+        # 添加最近几步的移动历史（直接遍历SoA数组尾部，负数切片对短序列同样安全）
+        recent = zip(game.move_rows[-6:], game.move_cols[-6:], game.move_players[-6:])
+        for i, (row, col, player) in enumerate(recent):
+            player_name = "玩家" if player == PLAYER_SYMBOL else "AI"
+            parts.append(f"{i+1}. {player_name} 在 ({row}, {col}) 下棋\n")
+
+        parts.append(self._PROMPT_TAIL)
+        return "".join(parts)
     
     def _parse_response(self, response: Dict[str, Any]) -> Optional[Tuple[int, int, str]]:
         """解析LLM的JSON响应"""
@@ -266,27 +305,32 @@ class LLMPlayer:
                 logger.error("No content in candidate")
                 return None
 
-            # 获取JSON文本
-            json_text = candidate["content"]["parts"][0].get("text", "")
-            if not json_text:
-                logger.error("No text in response")
-                return None
-
-            # 清理JSON文本（移除可能的markdown格式）
-            json_text = json_text.strip()
-            if json_text.startswith("```json"):
-                json_text = json_text[7:]
-            if json_text.endswith("```"):
-                json_text = json_text[:-3]
-            json_text = json_text.strip()
-
-            # 解析JSON
-            try:
-                data = json.loads(json_text)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON: {e}")
-                logger.error(f"JSON text: {json_text}")
-                return None
+            part = candidate["content"]["parts"][0]
+
+            # LMStudio适配器会随文本附带已解析的dict，命中时跳过字符串解析
+            data = part.get("json")
+            if data is None:
+                json_text = part.get("text", "")
+                if not json_text:
+                    logger.error("No text in response")
+                    return None
+
+                # 清理JSON文本（移除可能的markdown格式，兼容不带json标记的裸```围栏）
+                json_text = (
+                    json_text.strip()
+                    .removeprefix("```json")
+                    .removeprefix("```")
+                    .removesuffix("```")
+                    .strip()
+                )
+
+                # 解析JSON（orjson/json的解析错误都是ValueError的子类）
+                try:
+                    data = _json.loads(json_text)
+                except ValueError as e:
+                    logger.error(f"Failed to parse JSON: {e}")
+                    logger.error(f"JSON text: {json_text}")
+                    return None
 
             # 提取移动信息
             if "move" not in data:
@@ -310,27 +354,13 @@ class LLMPlayer:
     
     def _fallback_move(self, game: GomokuGame) -> Tuple[Optional[int], Optional[int], str]:
         """备用移动策略：选择中心附近的空位"""
-        empty_positions = game.get_empty_positions()
-        if not empty_positions:
-            return None, None, "No valid moves available"
-        
-        # 优先选择中心附近的位置
-        center = BOARD_SIZE // 2
-        best_pos = None
-        min_distance = float('inf')
-        
-        for row, col in empty_positions:
-            distance = abs(row - center) + abs(col - center)
-            if distance < min_distance:
-                min_distance = distance
-                best_pos = (row, col)
-        
-        if best_pos:
-            return best_pos[0], best_pos[1], "Fallback move: chose position near center"
-        else:
-            # 如果没有找到合适位置，选择第一个空位
-            pos = empty_positions[0]
-            return pos[0], pos[1], "Fallback move: chose first available position"
+        # 按预排序的中心距离顺序找第一个空位，排序成本已在模块加载时摊销；
+        # 绑定方法提出循环外，避免每次迭代的属性查找
+        is_valid = game.is_valid_move
+        for row, col in _CENTER_ORDER:
+            if is_valid(row, col):
+                return row, col, "Fallback move: chose position near center"
+        return None, None, "No valid moves available"
 
     def get_context_info(self) -> Dict[str, Any]:
         """获取上下文信息，包括token统计"""
@@ -384,7 +414,7 @@ class LLMPlayer:
             "last_request": self.debug_info.get("last_request"),
             "last_response": self.debug_info.get("last_response"),
             "last_request_time": self.debug_info.get("last_request_time", 0),
-            "request_history": self.debug_info.get("request_history", [])
+            "request_history": list(self.debug_info.get("request_history", ()))
         }
 
 
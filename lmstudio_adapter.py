@@ -3,36 +3,166 @@ LMStudio 适配器
 LMStudio adapter for LLMGomoku, providing Gemini-compatible interface
 """
 
+import asyncio
+import hashlib
 import json
 import logging
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, NamedTuple, Optional
 from lmstudio_client import LMStudioClient
 
-# 设置日志
-logging.basicConfig(level=logging.INFO)
+# 日志配置交由应用入口处理（main.py），模块内只获取logger
 logger = logging.getLogger(__name__)
 
+# orjson为可选加速依赖：序列化直接产出UTF-8字节，
+# 比stdlib json快数倍且省去ensure_ascii=False的转义处理
+try:
+    import orjson as _orjson
+except ImportError:  # pragma: no cover
+    _orjson = None
+
+if _orjson is not None:
+    def _dumps(obj: Any) -> str:
+        return _orjson.dumps(obj).decode()
+
+    def _dumps_bytes(obj: Any) -> bytes:
+        return _orjson.dumps(obj)
+else:
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+    def _dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode()
+
+# Token计数：优先用tiktoken精确编码；不可用时退回启发式估算，
+# 用预构建的删除表在C层一次扫描统计CJK字符，避免逐字符的Python循环
+try:
+    import tiktoken
+    _TIKTOKEN_ENC = tiktoken.get_encoding("cl100k_base")
+except Exception:  # pragma: no cover - 未安装或编码表不可下载
+    _TIKTOKEN_ENC = None
+
+_CJK_DELETE_TABLE = str.maketrans('', '', ''.join(chr(c) for c in range(0x4e00, 0xa000)))
+
+# Gemini与LMStudio的角色名称映射：只有model需要改名，其余原样映射；
+# 未知角色直接KeyError，避免把拼错的角色静默转发给服务器
+_ROLE_MAP = {
+    "model": "assistant",
+    "user": "user",
+    "assistant": "assistant",
+    "system": "system",
+}
+
+# Gemini与LMStudio的生成参数名称映射，模块加载时构建一次
+_GEN_PARAM_MAP = {
+    "maxOutputTokens": "max_tokens",
+    "temperature": "temperature",
+    "topP": "top_p",
+    "topK": "top_k",
+}
+
+
+class _Msg(NamedTuple):
+    """对话历史记录项：不可变的命名元组，比逐条dict省约2/3内存
+    （dataclass的slots=True需要3.10+，NamedTuple在3.9上同样紧凑）"""
+    role: str
+    content: str
+
+
+def _coords_in_range(row: int, col: int, coord_max: int) -> bool:
+    """坐标范围检查（抽成纯标量函数，numba可用时编译为原生代码）"""
+    return 0 <= row <= coord_max and 0 <= col <= coord_max
+
+
+# Numba为可选加速依赖：标量检查可编译为分支极少的原生代码，
+# 不可用时纯Python版本的开销同样可以接受
+try:
+    from numba import njit as _njit
+    _coords_in_range = _njit("boolean(int64, int64, int64)", cache=True)(_coords_in_range)
+except ImportError:  # pragma: no cover
+    pass
+
+
+def _count_tokens(text: str) -> int:
+    """估算文本的Token数量（中文按1个token，其他按0.75个token计算）"""
+    if _TIKTOKEN_ENC is not None:
+        return len(_TIKTOKEN_ENC.encode(text))
+    other_chars = len(text.translate(_CJK_DELETE_TABLE))
+    chinese_chars = len(text) - other_chars
+    return chinese_chars + int(other_chars * 0.75)
+
 
 class LMStudioAdapter:
     """LMStudio适配器，提供与Gemini API兼容的接口"""
 
-    def __init__(self, base_url: str = "http://localhost:1234/v1"):
+    def __init__(self, base_url: str = "http://localhost:1234/v1", concurrency_limit: int = 4,
+                 warm: bool = False):
         self.client = LMStudioClient(base_url)
         self.chat_session = None
-
-    def start_chat(self, model: str, system_prompt: str = "", generation_config: Optional[Dict] = None):
+        # 并发上限：避免批量评估时把本地推理服务器打满
+        self._semaphore = asyncio.Semaphore(concurrency_limit)
+        if warm:
+            self.warm()
+
+    def warm(self, model: Optional[str] = None) -> bool:
+        """预热推理服务器的结构化输出路径
+
+        llama.cpp系服务器首次收到json_schema请求时要编译语法（可能耗时数十秒，
+        且缓存有TTL），在首步落子前发一条极短的JSON请求可以把这笔开销挪到启动期。
+        预热失败（服务器未启动等）只记日志，不影响正常使用。
+        """
+        try:
+            self.client.chat_multi_json(
+                [{"role": "user", "content": "warmup"}],
+                model=model,
+                max_tokens=5,
+            )
+            return True
+        except Exception as e:
+            logger.warning("LMStudio warm-up request failed: %s", e)
+            return False
+
+    def start_chat(self, model: str, system_prompt: str = "", generation_config: Optional[Dict] = None,
+                   max_history_turns: int = 8):
         """启动聊天会话，返回兼容的ChatSession对象"""
-        return self.ChatSession(self.client, model, system_prompt, generation_config)
+        return self.ChatSession(self.client, model, system_prompt, generation_config,
+                                max_history_turns=max_history_turns)
+
+    async def send_batch(self, model: str, texts: List[str], system_prompt: str = "",
+                         generation_config: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """并发发送多条独立消息，返回与texts顺序一致的Gemini格式响应列表
+
+        每条消息使用共享系统提示词的独立会话，历史只在各自会话内变更，
+        不存在跨会话交错；并发度由适配器的信号量限制。
+        """
+        async def _send_one(text: str) -> Dict[str, Any]:
+            session = self.start_chat(model, system_prompt, generation_config)
+            async with self._semaphore:
+                return await session.async_send(text)
+
+        return list(await asyncio.gather(*(_send_one(t) for t in texts)))
 
     class ChatSession:
         """兼容Gemini API的ChatSession类"""
 
-        def __init__(self, client: LMStudioClient, model: str, system_prompt: str = "", generation_config: Optional[Dict] = None):
+        # 跨会话共享的响应缓存（LRU）：自博弈/测试会反复发出相同局面的提示词
+        _RESPONSE_CACHE: "OrderedDict[bytes, str]" = OrderedDict()
+        _RESPONSE_CACHE_MAX = 4096
+
+        def __init__(self, client: LMStudioClient, model: str, system_prompt: str = "",
+                     generation_config: Optional[Dict] = None, max_history_turns: int = 8):
             self.client = client
             self.model = model
             self.system_prompt = system_prompt
             self.generation_config = generation_config or {}
-            self._history: List[Dict[str, Any]] = []
+            # 历史滑动窗口：prefill成本随上下文长度超线性增长，
+            # 超出窗口的最早一轮用户/助手消息对被整对丢弃，系统提示词始终保留
+            self.max_history_turns = max_history_turns
+            self._history: List[_Msg] = []
+            # 与_history同步增量维护的LMStudio格式历史，避免每次请求O(N)重建
+            self._lmstudio_history: List[Dict[str, Any]] = []
+            # 会话级生成配置转换一次即可，逐次调用仅在有覆盖时才重新合并
+            self._lmstudio_params_base = self._convert_generation_config(self.generation_config)
 
             # Token usage tracking
             self._total_input_tokens = 0
@@ -40,29 +170,36 @@ class LMStudioAdapter:
 
             # 如果有系统提示词，添加到历史记录
             if system_prompt:
-                self._history.append({
-                    "role": "system",
-                    "content": system_prompt
-                })
+                self._append("system", system_prompt)
 
         @property
         def history(self) -> List[Dict[str, Any]]:
-            """返回对话历史"""
-            return self._history
+            """以字典列表形式返回对话历史（兼容视图，按需构建）"""
+            return [{"role": m.role, "content": m.content} for m in self._history]
+
+        def _append(self, role: str, content: str) -> None:
+            """向对话历史追加一条消息，同步维护LMStudio格式的副本"""
+            self._history.append(_Msg(role, content))
+            self._lmstudio_history.append({
+                "role": _ROLE_MAP[role],
+                "content": content
+            })
+            self._prune_history()
+
+        def _prune_history(self) -> None:
+            """历史超出滑动窗口时，从最早处按用户/助手整对裁剪（保留系统提示词）"""
+            if not self.max_history_turns:
+                return
+            base = 1 if self.system_prompt else 0
+            limit = 2 * self.max_history_turns + 1  # +1容纳窗口满时新追加的用户消息
+            while len(self._history) - base > limit:
+                del self._history[base:base + 2]
+                del self._lmstudio_history[base:base + 2]
 
         def _estimate_token_usage(self, input_text: str, output_text: str) -> None:
             """估算Token使用量（LMStudio可能不返回准确数据）"""
-            # 简单估算：中文字符按1个token，英文单词按0.75个token计算
-            def count_tokens(text: str) -> int:
-                chinese_chars = len([c for c in text if '\u4e00' <= c <= '\u9fff'])
-                other_chars = len(text) - chinese_chars
-                return chinese_chars + int(other_chars * 0.75)
-
-            input_tokens = count_tokens(input_text)
-            output_tokens = count_tokens(output_text)
-
-            self._total_input_tokens += input_tokens
-            self._total_output_tokens += output_tokens
+            self._total_input_tokens += _count_tokens(input_text)
+            self._total_output_tokens += _count_tokens(output_text)
 
         def get_token_usage(self) -> dict:
             """获取总Token使用量"""
@@ -72,25 +209,75 @@ class LMStudioAdapter:
                 "total_tokens": self._total_input_tokens + self._total_output_tokens
             }
 
+        def _cache_key(self, text: str) -> bytes:
+            """基于(模型, 系统提示词, 当前历史, 消息)计算缓存键"""
+            h = hashlib.blake2b(digest_size=16)
+            h.update(self.model.encode())
+            h.update(b"\0")
+            h.update(self.system_prompt.encode())
+            h.update(b"\0")
+            h.update(_dumps_bytes(self._lmstudio_history))
+            h.update(b"\0")
+            h.update(text.encode())
+            return h.digest()
+
+        def _should_use_cache(self, cache_flag: Optional[bool], **kwargs) -> bool:
+            """temperature>0时输出不可复现，除非调用方显式传cache=True才命中缓存"""
+            if cache_flag is not None:
+                return cache_flag
+            gen_config = {**self.generation_config}
+            if "generation_config" in kwargs:
+                gen_config.update(kwargs["generation_config"])
+            return gen_config.get("temperature", 1) == 0
+
+        def _cache_get(self, key: bytes) -> Optional[str]:
+            cache = self._RESPONSE_CACHE
+            text = cache.get(key)
+            if text is not None:
+                cache.move_to_end(key)
+            return text
+
+        def _cache_put(self, key: bytes, response_text: str) -> None:
+            cache = self._RESPONSE_CACHE
+            cache[key] = response_text
+            cache.move_to_end(key)
+            while len(cache) > self._RESPONSE_CACHE_MAX:
+                cache.popitem(last=False)
+
+        def _replay_cached(self, text: str, response_text: str) -> Dict[str, Any]:
+            """缓存命中：不产生网络请求，但仍把消息对写入历史保持会话一致"""
+            self._append("user", text)
+            self._append("assistant", response_text)
+            return self._convert_to_gemini_response(response_text)
+
         def send(self, text: str, **kwargs) -> Dict[str, Any]:
-            """发送消息，返回Gemini格式的响应"""
+            """发送消息，返回Gemini格式的响应
+
+            传入 cache=True/False 可强制启用/跳过响应缓存；
+            默认仅在 temperature 为 0 时启用。
+            """
+            cache_flag = kwargs.pop("cache", None)
+            use_cache = self._should_use_cache(cache_flag, **kwargs)
+            if use_cache:
+                cache_key = self._cache_key(text)
+                cached_text = self._cache_get(cache_key)
+                if cached_text is not None:
+                    return self._replay_cached(text, cached_text)
+
             try:
                 # 添加用户消息到历史
-                self._history.append({
-                    "role": "user",
-                    "content": text
-                })
+                self._append("user", text)
 
                 # 准备LMStudio格式的消息
                 messages = self._convert_history_to_lmstudio_format()
 
-                # 合并生成配置
-                gen_config = {**self.generation_config}
+                # 有逐次覆盖时才重新合并转换，否则直接用会话级的预转换结果
                 if "generation_config" in kwargs:
-                    gen_config.update(kwargs["generation_config"])
-
-                # 转换参数名称
-                lmstudio_params = self._convert_generation_config(gen_config)
+                    lmstudio_params = self._convert_generation_config(
+                        {**self.generation_config, **kwargs["generation_config"]}
+                    )
+                else:
+                    lmstudio_params = self._lmstudio_params_base
 
                 # 调用LMStudio API
                 response_text = self.client.chat_multi(
@@ -103,56 +290,60 @@ class LMStudioAdapter:
                 self._estimate_token_usage(text, response_text)
 
                 # 添加AI响应到历史
-                self._history.append({
-                    "role": "assistant",
-                    "content": response_text
-                })
+                self._append("assistant", response_text)
+
+                if use_cache:
+                    self._cache_put(cache_key, response_text)
 
                 # 转换为Gemini格式的响应
                 return self._convert_to_gemini_response(response_text)
 
             except Exception as e:
-                logger.error(f"Error in LMStudio chat: {e}")
+                logger.error("Error in LMStudio chat: %s", e)
                 # 返回错误响应，保持Gemini格式
-                return {
-                    "candidates": [{
-                        "content": {
-                            "parts": [{"text": f"[Error: {str(e)}]"}]
-                        },
-                        "finishReason": "ERROR"
-                    }]
-                }
+                return self._error_response(str(e))
 
         def send_json(self, text: str, schema: Optional[Dict] = None, **kwargs) -> Dict[str, Any]:
-            """发送消息并强制JSON响应，返回Gemini格式的响应"""
+            """发送消息并强制JSON响应，返回Gemini格式的响应
+
+            缓存语义与send相同：传入 cache=True/False 可强制控制，
+            默认仅在 temperature 为 0 时启用。
+            """
+            cache_flag = kwargs.pop("cache", None)
+            use_cache = self._should_use_cache(cache_flag, **kwargs)
+            if use_cache:
+                cache_key = self._cache_key(text)
+                cached_text = self._cache_get(cache_key)
+                if cached_text is not None:
+                    return self._replay_cached(text, cached_text)
+
             try:
                 # 添加用户消息到历史
-                self._history.append({
-                    "role": "user",
-                    "content": text
-                })
+                self._append("user", text)
 
                 # 准备LMStudio格式的消息
                 messages = self._convert_history_to_lmstudio_format()
 
-                # 合并生成配置
-                gen_config = {**self.generation_config}
+                # 有逐次覆盖时才重新合并转换，否则直接用会话级的预转换结果
                 if "generation_config" in kwargs:
-                    gen_config.update(kwargs["generation_config"])
-
-                # 转换参数名称
-                lmstudio_params = self._convert_generation_config(gen_config)
+                    lmstudio_params = self._convert_generation_config(
+                        {**self.generation_config, **kwargs["generation_config"]}
+                    )
+                else:
+                    lmstudio_params = self._lmstudio_params_base
 
-                # 调用LMStudio JSON API
-                response_data = self.client.chat_multi_json(
+                # 调用LMStudio流式JSON API：拿到第一个完整JSON对象即提前终止生成
+                response_data = self.client.chat_multi_json_stream(
                     messages,
                     model=self.model,
                     **lmstudio_params
                 )
 
-                # 记录原始响应数据用于调试
-                logger.info(f"LMStudio JSON response type: {type(response_data)}")
-                logger.info(f"LMStudio JSON response keys: {response_data.keys() if isinstance(response_data, dict) else 'Not a dict'}")
+                # 记录原始响应数据用于调试（仅debug级别才执行格式化与切片）
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("LMStudio JSON response type: %s", type(response_data))
+                    logger.debug("LMStudio JSON response keys: %s",
+                                 response_data.keys() if isinstance(response_data, dict) else "Not a dict")
 
                 # 验证和清理JSON响应
                 cleaned_response = self._validate_and_clean_json_response(response_data)
@@ -161,138 +352,207 @@ class LMStudioAdapter:
                     raise ValueError("Invalid JSON response from LMStudio")
 
                 # 将清理后的JSON响应转换为文本
-                response_text = json.dumps(cleaned_response, ensure_ascii=False)
+                response_text = _dumps(cleaned_response)
 
                 # 记录响应长度
-                logger.info(f"LMStudio cleaned JSON response length: {len(response_text)} characters")
-                if len(response_text) > 1000:
-                    logger.info(f"LMStudio cleaned JSON response preview: {response_text[:500]}...{response_text[-500:]}")
-                else:
-                    logger.info(f"LMStudio cleaned JSON response: {response_text}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("LMStudio cleaned JSON response length: %d characters", len(response_text))
+                    if len(response_text) > 1000:
+                        logger.debug("LMStudio cleaned JSON response preview: %s...%s",
+                                     response_text[:500], response_text[-500:])
+                    else:
+                        logger.debug("LMStudio cleaned JSON response: %s", response_text)
 
                 # 估算Token使用量
                 self._estimate_token_usage(text, response_text)
 
                 # 添加AI响应到历史
-                self._history.append({
-                    "role": "assistant",
-                    "content": response_text
-                })
+                self._append("assistant", response_text)
 
-                # 转换为Gemini格式的响应
-                return self._convert_to_gemini_response(response_text)
+                if use_cache:
+                    self._cache_put(cache_key, response_text)
+
+                # 转换为Gemini格式的响应（同时携带已解析的dict，免去下游再次解析）
+                return self._convert_to_gemini_response(response_text, cleaned_response)
 
             except Exception as e:
-                logger.error(f"Error in LMStudio JSON chat: {e}")
-                logger.error(f"Exception type: {type(e)}")
-                logger.error(f"Exception details: {str(e)}")
+                logger.error("Error in LMStudio JSON chat: %s (%s)", e, type(e))
                 # 返回错误响应，保持Gemini格式
-                return {
-                    "candidates": [{
-                        "content": {
-                            "parts": [{"text": f"[Error: {str(e)}]"}]
-                        },
-                        "finishReason": "ERROR"
-                    }]
-                }
+                return self._error_response(str(e))
+
+        # 批量请求的response_format：默认的对象schema会让服务器只返回单个
+        # 对象，N个提示词的结果被折叠成1个；这里改用带results数组的包装对象
+        _BATCH_RESPONSE_FORMAT = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "batch_response",
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "results": {"type": "array", "items": {"type": "object"}}
+                    },
+                    "required": ["results"],
+                },
+            },
+        }
+
+        def send_json_batch(self, texts: List[str], **kwargs) -> List[Dict[str, Any]]:
+            """把多个提示词合并为一次请求，返回与texts顺序一致的Gemini格式响应列表
+
+            N个提示词只经过一次TCP往返和一次prefill；模型被要求返回
+            {"results": [...]} 包装对象（schema同样要求该形状），逐项走与
+            send_json相同的验证，历史中只追加一对用户/助手消息。
+            响应条数与提示词数不符时用错误响应补齐，保证逐项对应。
+            """
+            joined = "\n\n".join(f"局面{i + 1}：\n{t}" for i, t in enumerate(texts))
+            prompt = (
+                "请分别分析下列每个局面，返回一个JSON对象："
+                "{\"results\": [...]}，其中results数组第i项是第i个局面的 "
+                "{\"analysis\", \"move\", \"reasoning\"} 对象。\n\n"
+                + joined
+            )
+            try:
+                # 添加用户消息到历史
+                self._append("user", prompt)
+
+                messages = self._convert_history_to_lmstudio_format()
+
+                if "generation_config" in kwargs:
+                    lmstudio_params = self._convert_generation_config(
+                        {**self.generation_config, **kwargs["generation_config"]}
+                    )
+                else:
+                    lmstudio_params = self._lmstudio_params_base
+
+                response_data = self.client.chat_multi_json(
+                    messages,
+                    model=self.model,
+                    response_format=self._BATCH_RESPONSE_FORMAT,
+                    **lmstudio_params
+                )
+
+                # 兼容模型不套包装、直接返回裸数组或单个对象的情况
+                if isinstance(response_data, dict):
+                    items = response_data.get("results")
+                    if not isinstance(items, list):
+                        items = [response_data]
+                else:
+                    items = response_data
+
+                cleaned_items = [
+                    self._validate_and_clean_json_response(item) for item in items
+                ]
+
+                # 条数不符时补齐/截断：调用方永远拿到len(texts)个响应
+                if len(cleaned_items) != len(texts):
+                    logger.warning("Batch response count mismatch: %d prompts, %d items",
+                                   len(texts), len(cleaned_items))
+                    cleaned_items = (cleaned_items + [None] * len(texts))[:len(texts)]
+
+                response_text = _dumps(cleaned_items)
+                self._estimate_token_usage(prompt, response_text)
+                self._append("assistant", response_text)
+
+                return [
+                    self._convert_to_gemini_response(
+                        _dumps(item), item
+                    ) if item else self._error_response("Invalid JSON item in batch response")
+                    for item in cleaned_items
+                ]
+
+            except Exception as e:
+                logger.error("Error in LMStudio JSON batch chat: %s", e)
+                return [self._error_response(str(e)) for _ in texts]
+
+        async def async_send(self, text: str, **kwargs) -> Dict[str, Any]:
+            """send的协程版本：阻塞的HTTP调用转移到线程池，不占用事件循环"""
+            return await asyncio.to_thread(self.send, text, **kwargs)
+
+        async def async_send_json(self, text: str, schema: Optional[Dict] = None,
+                                  **kwargs) -> Dict[str, Any]:
+            """send_json的协程版本，同样通过线程池转移阻塞调用"""
+            return await asyncio.to_thread(self.send_json, text, schema=schema, **kwargs)
 
         def _convert_history_to_lmstudio_format(self) -> List[Dict[str, Any]]:
-            """将历史记录转换为LMStudio格式"""
-            messages = []
-            for msg in self._history:
-                role = msg["role"]
-                content = msg["content"]
-                
-                # LMStudio使用不同的角色名称
-                if role == "model":
-                    role = "assistant"
-                
-                messages.append({
-                    "role": role,
-                    "content": content
-                })
-            
-            return messages
+            """返回LMStudio格式的历史记录（随_append增量维护，无需逐条重建）"""
+            return self._lmstudio_history
 
         def _convert_generation_config(self, config: Dict[str, Any]) -> Dict[str, Any]:
             """转换生成配置参数名称"""
-            converted = {}
-            
-            # 参数名称映射
-            param_mapping = {
-                "maxOutputTokens": "max_tokens",
-                "temperature": "temperature",
-                "topP": "top_p",
-                "topK": "top_k"
+            return {
+                _GEN_PARAM_MAP[k]: v for k, v in config.items() if k in _GEN_PARAM_MAP
             }
-            
-            for gemini_param, lmstudio_param in param_mapping.items():
-                if gemini_param in config:
-                    converted[lmstudio_param] = config[gemini_param]
-            
-            return converted
+
+        # 校验约束在类体中固定一次（字段集合与坐标上限），方法内不再重建
+        _REQUIRED_FIELDS = frozenset(("analysis", "move", "reasoning"))
+        _COORD_MAX = 14
 
         def _validate_and_clean_json_response(self, response_data: Any) -> Optional[Dict[str, Any]]:
             """验证和清理JSON响应，确保符合五子棋游戏的要求"""
-            try:
-                # 如果响应不是字典，尝试解析
-                if not isinstance(response_data, dict):
-                    logger.warning(f"Response is not a dict, type: {type(response_data)}")
-                    return None
-
-                # 检查必需的字段
-                required_fields = ["analysis", "move", "reasoning"]
-                for field in required_fields:
-                    if field not in response_data:
-                        logger.error(f"Missing required field: {field}")
-                        return None
-
-                # 验证move字段
-                move = response_data.get("move")
-                if not isinstance(move, dict):
-                    logger.error(f"Move field is not a dict: {move}")
-                    return None
-
-                if "row" not in move or "col" not in move:
-                    logger.error(f"Move missing row or col: {move}")
-                    return None
-
-                try:
-                    row = int(move["row"])
-                    col = int(move["col"])
-                except (ValueError, TypeError):
-                    logger.error(f"Invalid row/col values: {move}")
-                    return None
-
-                # 验证坐标范围
-                if not (0 <= row <= 14 and 0 <= col <= 14):
-                    logger.error(f"Row/col out of range: row={row}, col={col}")
-                    return None
-
-                # 构建清理后的响应
-                cleaned_response = {
-                    "analysis": str(response_data.get("analysis", "")),
-                    "move": {
-                        "row": row,
-                        "col": col
-                    },
-                    "reasoning": str(response_data.get("reasoning", ""))
-                }
+            if not isinstance(response_data, dict):
+                logger.warning("Response is not a dict, type: %s", type(response_data))
+                return None
 
-                logger.info(f"JSON response validated successfully: move=({row}, {col})")
-                return cleaned_response
+            if not self._REQUIRED_FIELDS <= response_data.keys():
+                logger.error("Missing required fields: %s", self._REQUIRED_FIELDS - response_data.keys())
+                return None
 
-            except Exception as e:
-                logger.error(f"Error validating JSON response: {e}")
+            # 单次EAFP提取：字段缺失/类型错误统一落到except分支
+            move = response_data["move"]
+            try:
+                row = int(move["row"])
+                col = int(move["col"])
+            except (KeyError, TypeError, ValueError):
+                logger.error("Invalid move field: %s", move)
+                return None
+
+            # 验证坐标范围
+            if not _coords_in_range(row, col, self._COORD_MAX):
+                logger.error("Row/col out of range: row=%s, col=%s", row, col)
                 return None
 
-        def _convert_to_gemini_response(self, response_text: str) -> Dict[str, Any]:
-            """将LMStudio响应转换为Gemini格式"""
+            # 构建清理后的响应
+            cleaned_response = {
+                "analysis": str(response_data["analysis"]),
+                "move": {
+                    "row": row,
+                    "col": col
+                },
+                "reasoning": str(response_data["reasoning"])
+            }
+
+            logger.debug("JSON response validated successfully: move=(%d, %d)", row, col)
+            return cleaned_response
+
+        # 响应信封不做对象池化：调用方（会话历史、调试记录）会长期持有
+        # 返回的dict，信封的所有权并未回到适配器手里，复用会让后续请求
+        # 改写仍被引用的响应，直接新建4层小dict交给分代GC处理即可
+        def _convert_to_gemini_response(self, response_text: str,
+                                        response_json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+            """将LMStudio响应转换为Gemini格式
+
+            已解析过的JSON响应可经response_json一并携带，
+            下游拿到现成的dict即可跳过对text的二次解析。
+            """
+            part: Dict[str, Any] = {"text": response_text}
+            if response_json is not None:
+                part["json"] = response_json
             return {
                 "candidates": [{
                     "content": {
-                        "parts": [{"text": response_text}]
+                        "parts": [part]
                     },
                     "finishReason": "STOP"
                 }]
             }
+
+        def _error_response(self, message: str) -> Dict[str, Any]:
+            """构造Gemini格式的错误响应"""
+            return {
+                "candidates": [{
+                    "content": {
+                        "parts": [{"text": f"[Error: {message}]"}]
+                    },
+                    "finishReason": "ERROR"
+                }]
+            }
@@ -1,9 +1,38 @@
+import atexit
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import base64
+import logging
 import os
+import re
+import time
 from typing import List, Dict, Any, Iterator, Optional
 
+logger = logging.getLogger(__name__)
+
+# httpx为异步路径的依赖：未安装时同步接口不受影响
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+# orjson为可选加速依赖：C实现的JSON解析对多KB的模型响应快数倍，
+# 不可用时退回stdlib json
+try:
+    import orjson as _orjson
+except ImportError:  # pragma: no cover
+    _orjson = None
+
+_loads = _orjson.loads if _orjson is not None else json.loads
+# 请求体序列化同理：orjson直接产出bytes，省去dumps后的一次UTF-8编码
+if _orjson is not None:
+    _dumps_bytes = _orjson.dumps
+else:
+    def _dumps_bytes(obj):
+        return json.dumps(obj).encode()
+
 class LMStudioClient:
     """
     一个用于与 LM Studio 本地推理服务器进行交互的 Python 客户端工具类。
@@ -13,30 +42,145 @@ class LMStudioClient:
     # --- 可配置参数 ---
     DEFAULT_MODEL = "deepseek-r1-0528-qwen3-8b"
     # 备注一个推荐的多模态模型: qwen2.5-vl-3b-instruct
-    VISION_MODEL = "qwen2.5-vl-3b-instruct" 
-    
-    def __init__(self, base_url: str = "http://localhost:1234/v1"):
+    VISION_MODEL = "qwen2.5-vl-3b-instruct"
+
+    # 超时：连接3.05秒（略大于TCP重传阈值），读取120秒（容纳长推理）
+    REQUEST_TIMEOUT = (3.05, 120)
+
+    # 流式输出合并：攒够约一个MTU的文本或超过25ms才向调用方产出一次，
+    # 把逐token的生成器唤醒合并为粗粒度的批次
+    _COALESCE_FLUSH_INTERVAL = 0.025
+
+    # SSE帧识别用预编译的字节正则：一次C层匹配同时完成前缀判断与[DONE]
+    # 识别，group(1)为None即流结束标记
+    _SSE_RE = re.compile(rb"^data: (?:\[DONE\]\s*|(.*))$")
+
+    # 强制JSON输出的response_format载荷固定不变，类加载时构建一次
+    _JSON_RESPONSE_FORMAT = {"type": "json_schema", "json_schema": {"name": "response", "schema": {"type": "object"}}}
+
+    def __init__(self, base_url: str = "http://localhost:1234/v1",
+                 session: Optional[requests.Session] = None):
         """
         初始化客户端。
 
         :param base_url: LM Studio API 的基础 URL。
                          通常是 'http://<你的IP地址>:1234/v1'。
+        :param session: 可选的 requests.Session。默认创建一个带连接池的会话，
+                        所有请求复用同一个 TCP 连接，免去每次调用的握手开销。
         """
         self.base_url = base_url
         self.chat_endpoint = f"{self.base_url}/chat/completions"
+        # 请求头固定不变，构造一次复用
+        self._headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        if session is None:
+            session = requests.Session()
+            # POST非幂等，只对尚未发出请求的连接类错误重试（小退避两次）；
+            # 读超时或5xx时服务器可能已在生成，重试会触发重复推理，故不重试
+            retry = Retry(total=None, connect=2, read=0, redirect=0,
+                          status=0, other=0, backoff_factor=0.2)
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self._session = session
+        # 进程退出时释放连接池
+        atexit.register(self._session.close)
+        # 图片Base64编码缓存：键为(路径, 大小, mtime)，文件变动自动失效
+        self._img_cache: Dict[tuple, str] = {}
+
+        # 异步客户端按需创建（见_ensure_aclient）
+        self._aclient = None
+        # 默认模型名提为实例属性，热路径上少一级类属性查找
+        self._default_model = self.DEFAULT_MODEL
+
+    def close(self) -> None:
+        """关闭底层HTTP会话，释放连接池资源"""
+        self._session.close()
+
+    # --- 异步接口 ---
+
+    def _ensure_aclient(self) -> "httpx.AsyncClient":
+        """按需创建共享的httpx.AsyncClient（事件循环内复用连接池）"""
+        if httpx is None:
+            raise RuntimeError("异步接口需要安装 httpx (pip install httpx)")
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                timeout=httpx.Timeout(120.0, connect=3.0),
+            )
+        return self._aclient
+
+    async def _apost(self, payload: Dict[str, Any]) -> "httpx.Response":
+        """_post_request的协程版本"""
+        client = self._ensure_aclient()
+        response = await client.post(self.chat_endpoint, headers=self._headers,
+                                     content=_dumps_bytes(payload))
+        response.raise_for_status()
+        return response
+
+    async def achat_multi(self, messages: List[Dict[str, Any]], model: Optional[str] = None, **kwargs) -> str:
+        """chat_multi的协程版本：不阻塞事件循环"""
+        if kwargs:
+            payload = {"model": model or self._default_model, "messages": messages, **kwargs}
+        else:
+            payload = {"model": model or self._default_model, "messages": messages}
+        response = await self._apost(payload)
+        response_data = _loads(response.content)
+        return response_data['choices'][0]['message']['content']
+
+    async def achat_multi_json(self, messages: List[Dict[str, Any]], model: Optional[str] = None, **kwargs) -> Dict:
+        """chat_multi_json的协程版本：不阻塞事件循环"""
+        kwargs.setdefault('response_format', self._JSON_RESPONSE_FORMAT)
+        response_text = await self.achat_multi(messages, model, **kwargs)
+        cleaned_json = self._extract_and_clean_json(response_text)
+        if cleaned_json:
+            return cleaned_json
+        return _loads(response_text)
+
+    async def aclose(self) -> None:
+        """关闭异步客户端（若已创建）"""
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+
+    # 缓存条目上限：图片可能较大，只保留最近少量条目
+    _IMG_CACHE_MAX = 8
+
+    # 扩展名到MIME类型映射（imghdr已在Python 3.13移除，按扩展名判断）
+    _IMG_MIME_TYPES = {
+        ".png": "image/png",
+        ".gif": "image/gif",
+        ".webp": "image/webp",
+        ".bmp": "image/bmp",
+        ".jpg": "image/jpeg",
+        ".jpeg": "image/jpeg",
+    }
 
     def _encode_image_to_base64(self, image_path: str) -> str:
         """
-        将本地图片文件编码为 Base64 字符串。
+        将本地图片编码为可直接嵌入消息的 data URL（按路径+大小+修改时间缓存）。
 
         :param image_path: 图片文件的路径。
-        :return: Base64 编码后的字符串。
+        :return: "data:<mime>;base64,..." 形式的完整 data URL。
         :raises FileNotFoundError: 如果图片路径不存在。
         """
-        if not os.path.exists(image_path):
+        try:
+            st = os.stat(image_path)
+        except OSError:
             raise FileNotFoundError(f"图片文件未找到: {image_path}")
+        key = (image_path, st.st_size, st.st_mtime_ns)
+        cached = self._img_cache.get(key)
+        if cached is not None:
+            return cached
+        ext = os.path.splitext(image_path)[1].lower()
+        mime = self._IMG_MIME_TYPES.get(ext, "image/jpeg")
         with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+            # 直接拼成data URL缓存，消息构造时不再复制几百KB的base64串
+            data_url = f"data:{mime};base64," + base64.b64encode(image_file.read()).decode('ascii')
+        if len(self._img_cache) >= self._IMG_CACHE_MAX:
+            # 简单整体清空：图片重复集很小，淘汰策略不值得更复杂
+            self._img_cache.clear()
+        self._img_cache[key] = data_url
+        return data_url
 
     def _post_request(self, payload: Dict[str, Any]) -> requests.Response:
         """
@@ -46,17 +190,17 @@ class LMStudioClient:
         :return: requests 的响应对象。
         :raises requests.exceptions.RequestException: 如果发生网络错误。
         """
-        headers = {"Content-Type": "application/json"}
         try:
-            response = requests.post(self.chat_endpoint, headers=headers, data=json.dumps(payload), stream=payload.get("stream", False))
+            response = self._session.post(self.chat_endpoint, headers=self._headers, data=_dumps_bytes(payload),
+                                          stream=payload.get("stream", False), timeout=self.REQUEST_TIMEOUT)
             response.raise_for_status()  # 如果状态码是 4xx 或 5xx，则抛出异常
             return response
         except requests.exceptions.RequestException as e:
-            print(f"请求 API 时发生错误: {e}")
+            logger.error("请求 API 时发生错误: %s", e)
             # 尝试解析错误响应体
             try:
                 error_details = e.response.json()
-                print(f"API 返回的错误详情: {error_details}")
+                logger.error("API 返回的错误详情: %s", error_details)
             except (ValueError, AttributeError):
                 pass
             raise
@@ -84,47 +228,89 @@ class LMStudioClient:
         :param kwargs: 其他传递给 API 的参数 (例如 temperature, max_tokens)。
         :return: 模型的回复文本。
         """
-        payload = {
-            "model": model or self.DEFAULT_MODEL,
-            "messages": messages,
-            **kwargs
-        }
+        if kwargs:
+            payload = {"model": model or self._default_model, "messages": messages, **kwargs}
+        else:
+            payload = {"model": model or self._default_model, "messages": messages}
         response = self._post_request(payload)
-        response_data = response.json()
+        # 直接解析原始字节，绕过response.json()的编码探测
+        response_data = _loads(response.content)
         return response_data['choices'][0]['message']['content']
 
-    def chat_stream(self, messages: List[Dict[str, Any]], model: Optional[str] = None, **kwargs) -> Iterator[str]:
+    def chat_stream(self, messages: List[Dict[str, Any]], model: Optional[str] = None,
+                    coalesce_bytes: int = 1490, **kwargs) -> Iterator[str]:
         """
         以流式方式进行多轮对话。
 
         :param messages: 对话历史列表。
         :param model: 要使用的模型名称。如果为 None，则使用类默认模型。
+        :param coalesce_bytes: 输出合并阈值（字符数）。逐token的SSE事件会先在
+            内部累积，攒够该量或距上次产出超过25ms才yield一次，减少生成器
+            唤醒和下游处理次数。传0则恢复逐块产出。
         :param kwargs: 其他传递给 API 的参数。
-        :return: 一个迭代器，逐块产生模型的回复文本。
+        :return: 一个迭代器，分批产生模型的回复文本。
         """
         payload = {
-            "model": model or self.DEFAULT_MODEL,
+            "model": model or self._default_model,
             "messages": messages,
             "stream": True,
             **kwargs
         }
         response = self._post_request(payload)
-        for line in response.iter_lines():
-            if line:
-                decoded_line = line.decode('utf-8')
-                if decoded_line.startswith('data: '):
-                    json_str = decoded_line[6:]
-                    if json_str.strip() == '[DONE]':
+        out_buf: List[str] = []
+        out_size = 0
+        last_flush = time.monotonic()
+        try:
+            # 字节级解析：大块读取后手工按行切分，SSE前缀判断和[DONE]比较
+            # 都在bytes上完成，每行免去一次UTF-8解码（JSON解析器直接吃bytes）
+            buf = bytearray()
+            done = False
+            for raw in response.iter_content(chunk_size=8192):
+                buf += raw
+                while True:
+                    nl = buf.find(b"\n")
+                    if nl == -1:
+                        break
+                    line = bytes(buf[:nl]).rstrip(b"\r")
+                    del buf[:nl + 1]
+                    m = self._SSE_RE.match(line)
+                    if m is None:
+                        continue
+                    json_bytes = m.group(1)
+                    if json_bytes is None:
+                        done = True
                         break
                     try:
-                        data = json.loads(json_str)
-                        if 'choices' in data and data['choices']:
-                            delta = data['choices'][0].get('delta', {})
-                            content_chunk = delta.get('content')
-                            if content_chunk:
-                                yield content_chunk
-                    except json.JSONDecodeError:
-                        print(f"无法解析的流数据: {json_str}")
+                        data = _loads(json_bytes)
+                    except ValueError:
+                        logger.warning("无法解析的流数据: %r", json_bytes)
+                        continue
+                    if 'choices' in data and data['choices']:
+                        delta = data['choices'][0].get('delta', {})
+                        content_chunk = delta.get('content')
+                        if not content_chunk:
+                            continue
+                        if coalesce_bytes <= 0:
+                            yield content_chunk
+                            continue
+                        out_buf.append(content_chunk)
+                        out_size += len(content_chunk)
+                        now = time.monotonic()
+                        if (out_size >= coalesce_bytes
+                                or now - last_flush >= self._COALESCE_FLUSH_INTERVAL):
+                            yield ''.join(out_buf)
+                            out_buf.clear()
+                            out_size = 0
+                            last_flush = now
+                if done:
+                    break
+            # 流结束时产出合并缓冲中的尾部残留
+            if out_buf:
+                yield ''.join(out_buf)
+        finally:
+            # 迭代完成或调用方提前close()生成器时，释放底层HTTP连接，
+            # 提前关闭还能让服务器停止继续生成
+            response.close()
 
     # --- 强制 JSON 输出方法 ---
 
@@ -149,14 +335,17 @@ class LMStudioClient:
         :param kwargs: 其他传递给 API 的参数。
         :return: 模型回复的已解析的 JSON 对象 (字典或列表)。
         """
-        kwargs['response_format'] = {"type": "json_schema", "json_schema": {"name": "response", "schema": {"type": "object"}}}
+        kwargs.setdefault('response_format', self._JSON_RESPONSE_FORMAT)
         response_text = self.chat_multi(messages, model, **kwargs)
 
-        print(f"[DEBUG] LMStudio raw response length: {len(response_text)}")
-        if len(response_text) > 2000:
-            print(f"[DEBUG] LMStudio raw response preview: {response_text[:1000]}...{response_text[-1000:]}")
-        else:
-            print(f"[DEBUG] LMStudio raw response: {response_text}")
+        # 原始响应转储只在debug级别执行，避免每次调用的切片与I/O开销
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("LMStudio raw response length: %d", len(response_text))
+            if len(response_text) > 2000:
+                logger.debug("LMStudio raw response preview: %s...%s",
+                             response_text[:1000], response_text[-1000:])
+            else:
+                logger.debug("LMStudio raw response: %s", response_text)
 
         # 清理和提取JSON
         cleaned_json = self._extract_and_clean_json(response_text)
@@ -165,52 +354,82 @@ class LMStudioClient:
 
         # 如果清理失败，尝试直接解析
         try:
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
-            print("模型返回的不是一个有效的 JSON 字符串:")
-            print(f"JSON解析错误: {e}")
-            print(f"响应文本: {response_text}")
+            return _loads(response_text)
+        except ValueError as e:
+            logger.error("模型返回的不是一个有效的 JSON 字符串: %s", e)
+            logger.error("响应文本: %s", response_text)
             raise
 
+    def chat_multi_json_stream(self, messages: List[Dict[str, Any]], model: Optional[str] = None, **kwargs) -> Dict:
+        """
+        以流式方式进行多轮对话并强制 JSON 输出，解析到第一个完整的 JSON 对象即停止读取。
+
+        模型在 JSON 对象之后常跟着无用的收尾文本；提前关闭流可以省掉这部分
+        生成时间和网络传输。若流结束仍未得到完整对象，退回整段文本的清理逻辑。
+
+        :param messages: 对话历史列表。
+        :param model: 要使用的模型名称。如果为 None，则使用类默认模型。
+        :param kwargs: 其他传递给 API 的参数。
+        :return: 模型回复的已解析的 JSON 对象 (字典)。
+        """
+        kwargs.setdefault('response_format', self._JSON_RESPONSE_FORMAT)
+        decoder = json.JSONDecoder()
+        buf = []
+        stream = self.chat_stream(messages, model, **kwargs)
+        try:
+            for chunk in stream:
+                buf.append(chunk)
+                # 只有新块可能闭合对象时才尝试解析，避免每个小块都拼接全文
+                if '}' not in chunk:
+                    continue
+                text = ''.join(buf)
+                start_idx = text.find('{')
+                if start_idx == -1:
+                    continue
+                try:
+                    obj, _ = decoder.raw_decode(text, start_idx)
+                except json.JSONDecodeError:
+                    continue
+                return obj
+        finally:
+            stream.close()
+
+        # 流自然结束但未解析出完整对象，走与chat_multi_json相同的兜底路径
+        response_text = ''.join(buf)
+        cleaned_json = self._extract_and_clean_json(response_text)
+        if cleaned_json:
+            return cleaned_json
+        return _loads(response_text)
+
+    # raw_decode从指定偏移起解析出第一个完整JSON值并返回结束位置，
+    # C层实现且正确处理字符串内的花括号（朴素计数会被 "a":"}" 这类内容骗过）
+    _JSON_DECODER = json.JSONDecoder()
+
     def _extract_and_clean_json(self, text: str) -> Optional[Dict]:
         """从响应文本中提取和清理JSON"""
         try:
-            # 移除可能的markdown格式
-            text = text.strip()
-            if text.startswith("```json"):
-                text = text[7:]
-            if text.endswith("```"):
-                text = text[:-3]
-            text = text.strip()
-
-            # 查找JSON对象的开始和结束
-            start_idx = text.find('{')
+            # 无需先strip或剥markdown围栏：raw_decode从第一个'{'或'['原地
+            # 扫描（批量调用可能返回顶层数组），解析到值闭合即止，前后的
+            # 围栏/空白/收尾文本天然被跳过，多KB响应上省去两次整串拷贝
+            brace_idx = text.find('{')
+            bracket_idx = text.find('[')
+            if brace_idx == -1:
+                start_idx = bracket_idx
+            elif bracket_idx == -1:
+                start_idx = brace_idx
+            else:
+                start_idx = min(brace_idx, bracket_idx)
             if start_idx == -1:
                 return None
 
-            # 从后往前找最后一个完整的}
-            brace_count = 0
-            end_idx = -1
-            for i in range(start_idx, len(text)):
-                if text[i] == '{':
-                    brace_count += 1
-                elif text[i] == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        end_idx = i
-                        break
-
-            if end_idx == -1:
-                print("[DEBUG] Could not find complete JSON object")
-                return None
-
-            json_text = text[start_idx:end_idx + 1]
-            print(f"[DEBUG] Extracted JSON: {json_text}")
-
-            return json.loads(json_text)
+            obj, _ = self._JSON_DECODER.raw_decode(text, start_idx)
+            return obj
 
+        except ValueError:
+            logger.debug("Could not find complete JSON object")
+            return None
         except Exception as e:
-            print(f"[DEBUG] Error extracting JSON: {e}")
+            logger.debug("Error extracting JSON: %s", e)
             return None
 
     # --- 多模态方法 ---
@@ -225,7 +444,7 @@ class LMStudioClient:
         :param kwargs: 其他传递给 API 的参数 (例如 max_tokens)。
         :return: 模型的回复文本。
         """
-        base64_image = self._encode_image_to_base64(image_path)
+        image_data_url = self._encode_image_to_base64(image_path)
         messages = [
             {
                 "role": "user",
@@ -234,7 +453,7 @@ class LMStudioClient:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
+                            "url": image_data_url
                         }
                     }
                 ]
@@ -258,14 +477,13 @@ class LMStudioClient:
         :param kwargs: 其他传递给 API 的参数。
         :return: 模型回复的已解析的 JSON 对象 (字典或列表)。
         """
-        kwargs['response_format'] = {"type": "json_schema", "json_schema": {"name": "response", "schema": {"type": "object"}}}
+        kwargs.setdefault('response_format', self._JSON_RESPONSE_FORMAT)
         # chat_vision 内部会处理消息格式和模型选择
         response_text = self.chat_vision(prompt, image_path, model, **kwargs)
         try:
-            return json.loads(response_text)
-        except json.JSONDecodeError:
-            print("模型返回的不是一个有效的 JSON 字符串:")
-            print(response_text)
+            return _loads(response_text)
+        except ValueError:
+            logger.error("模型返回的不是一个有效的 JSON 字符串: %s", response_text)
             raise
 
 # --- 使用示例 ---
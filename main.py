@@ -3,10 +3,12 @@ LLMGomoku FastAPI 主应用
 Main FastAPI application for LLMGomoku
 """
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from pydantic import BaseModel
+import asyncio
+import hashlib
 import logging
 import os
 import sys
@@ -31,12 +33,18 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # 创建FastAPI应用
-app = FastAPI(title="LLMGomoku", description="LLM驱动的五子棋游戏", version="1.0.0")
+# 默认响应类用ORJSONResponse：棋盘等嵌套结构的序列化比stdlib json快数倍
+app = FastAPI(title="LLMGomoku", description="LLM驱动的五子棋游戏", version="1.0.0",
+              default_response_class=ORJSONResponse)
 
 # 全局游戏状态
 game = GomokuGame()
 llm_player = LLMPlayer()
 
+# 状态锁：并发的落子/重置请求串行修改游戏状态；
+# LLM调用在锁外对快照执行，期间状态查询不受阻塞
+state_lock = asyncio.Lock()
+
 # 创建static目录（如果不存在）
 if not os.path.exists("static"):
     os.makedirs("static")
@@ -57,13 +65,34 @@ class GameResponse(BaseModel):
     ai_move: Dict[str, Any] = None
 
 
-@app.get("/", response_class=HTMLResponse)
-async def read_root():
-    """返回主页面"""
+def _load_index_html():
+    """启动时把主页面读入内存并预计算ETag，之后每次GET /只是内存拷贝"""
     try:
-        with open("static/index.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
+        with open("static/index.html", "rb") as f:
+            html = f.read()
     except FileNotFoundError:
+        app.state.index_html = None
+        app.state.index_etag = None
+        return
+    app.state.index_html = html
+    app.state.index_etag = f'"{hashlib.blake2b(html, digest_size=8).hexdigest()}"'
+
+
+@app.on_event("startup")
+async def startup_event():
+    """启动时预加载静态主页面"""
+    _load_index_html()
+
+
+@app.get("/", response_class=HTMLResponse)
+async def read_root(request: Request):
+    """返回主页面"""
+    html = getattr(app.state, "index_html", None)
+    if html is None:
+        # 启动时文件不存在：再试一次（开发期可能随后补上），仍缺失则回退提示页
+        _load_index_html()
+        html = app.state.index_html
+    if html is None:
         return HTMLResponse(content="""
         <html>
             <head><title>LLMGomoku</title></head>
@@ -74,32 +103,42 @@ async def read_root():
             </body>
         </html>
         """)
+    etag = app.state.index_etag
+    # 浏览器带着相同ETag再验证时直接304，省去整页传输
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(
+        content=html,
+        media_type="text/html; charset=utf-8",
+        headers={"Cache-Control": "public, max-age=60", "ETag": etag},
+    )
 
 
 @app.get("/api/game/state")
 async def get_game_state():
     """获取当前游戏状态"""
-    game_state = game.to_json()
+    # to_json()的结果在两次落子间是共享的记忆化dict，浅拷贝后再附加字段
+    game_state = dict(game.to_json())
     # 添加回合数统计
-    game_state["round_number"] = len(game.move_history) // 2 + 1
+    game_state["round_number"] = len(game.move_rows) // 2 + 1
     # 添加AI最新落子信息
     game_state["last_ai_move"] = llm_player.last_ai_move
-    return JSONResponse(content=game_state)
+    return ORJSONResponse(content=game_state)
 
 
 @app.post("/api/game/reset")
 async def reset_game():
     """重置游戏"""
-    global game, llm_player
-    game.reset_game()
-    # 重新初始化LLM玩家以清除对话历史和Token统计
-    llm_player = LLMPlayer()
-    logger.info("Game reset - Token usage statistics cleared")
-    return JSONResponse(content={
-        "success": True,
-        "message": "游戏已重置",
-        "game_state": game.to_json()
-    })
+    async with state_lock:
+        game.reset_game()
+        # 就地重置LLM玩家：清除对话历史和Token统计，但保留客户端连接池
+        llm_player.reset()
+        logger.info("Game reset - Token usage statistics cleared")
+        return ORJSONResponse(content={
+            "success": True,
+            "message": "游戏已重置",
+            "game_state": game.to_json()
+        })
 
 
 @app.post("/api/game/move", response_model=GameResponse)
@@ -107,53 +146,61 @@ async def make_move(move_request: MoveRequest):
     """玩家下棋"""
     try:
         row, col = move_request.row, move_request.col
-        
-        # 检查游戏是否结束
-        if game.game_over:
-            raise HTTPException(status_code=400, detail="游戏已结束")
-        
-        # 检查是否轮到玩家
-        if game.current_player != PLAYER_SYMBOL:
-            raise HTTPException(status_code=400, detail="现在不是你的回合")
-        
-        # 执行玩家移动
-        if not game.make_move(row, col, PLAYER_SYMBOL):
-            raise HTTPException(status_code=400, detail="无效的移动")
-        
-        logger.info(f"Player move: ({row}, {col})")
-        
-        # 检查游戏是否结束
-        if game.game_over:
-            winner_text = "玩家获胜！" if game.winner == PLAYER_SYMBOL else "平局！"
-            return GameResponse(
-                success=True,
-                message=f"游戏结束 - {winner_text}",
-                game_state=game.to_json()
-            )
-        
-        # AI回合
-        ai_row, ai_col, ai_reasoning = llm_player.get_move(game)
-        
+
+        # 玩家落子在锁内完成，避免并发落子/重置请求交错修改状态
+        async with state_lock:
+            # 检查游戏是否结束
+            if game.game_over:
+                raise HTTPException(status_code=400, detail="游戏已结束")
+
+            # 检查是否轮到玩家
+            if game.current_player != PLAYER_SYMBOL:
+                raise HTTPException(status_code=400, detail="现在不是你的回合")
+
+            # 执行玩家移动
+            if not game.make_move(row, col, PLAYER_SYMBOL):
+                raise HTTPException(status_code=400, detail="无效的移动")
+
+            logger.info(f"Player move: ({row}, {col})")
+
+            # 检查游戏是否结束
+            if game.game_over:
+                winner_text = "玩家获胜！" if game.winner == PLAYER_SYMBOL else "平局！"
+                return GameResponse(
+                    success=True,
+                    message=f"游戏结束 - {winner_text}",
+                    game_state=game.to_json()
+                )
+
+            # LLM调用期间不持锁：对局面快照推理，状态查询等端点不受阻塞
+            snapshot = game.clone()
+
+        # AI回合：LLM调用是阻塞的同步I/O，转移到线程池执行
+        ai_row, ai_col, ai_reasoning = await asyncio.to_thread(llm_player.get_move, snapshot)
+
         if ai_row is None or ai_col is None:
             raise HTTPException(status_code=500, detail="AI无法选择移动")
-        
-        # 执行AI移动
-        if not game.make_move(ai_row, ai_col, AI_SYMBOL):
-            raise HTTPException(status_code=500, detail="AI选择了无效的移动")
-        
-        logger.info(f"AI move: ({ai_row}, {ai_col}) - {ai_reasoning}")
-        
-        # 检查游戏是否结束
-        if game.game_over:
-            winner_text = "AI获胜！" if game.winner == AI_SYMBOL else "平局！"
-            message = f"游戏结束 - {winner_text}"
-        else:
-            message = "移动成功，轮到你了"
-        
+
+        # 重新持锁应用AI移动；推理期间若游戏被重置则落子会被判为无效
+        async with state_lock:
+            if game.current_player != AI_SYMBOL or not game.make_move(ai_row, ai_col, AI_SYMBOL):
+                raise HTTPException(status_code=500, detail="AI选择了无效的移动")
+
+            logger.info(f"AI move: ({ai_row}, {ai_col}) - {ai_reasoning}")
+
+            # 检查游戏是否结束
+            if game.game_over:
+                winner_text = "AI获胜！" if game.winner == AI_SYMBOL else "平局！"
+                message = f"游戏结束 - {winner_text}"
+            else:
+                message = "移动成功，轮到你了"
+
+            game_state = game.to_json()
+
         return GameResponse(
             success=True,
             message=message,
-            game_state=game.to_json(),
+            game_state=game_state,
             ai_move={
                 "row": ai_row,
                 "col": ai_col,
@@ -172,15 +219,18 @@ async def make_move(move_request: MoveRequest):
 async def get_ai_move():
     """获取AI的下一步移动（仅用于测试）"""
     try:
-        if game.game_over:
-            raise HTTPException(status_code=400, detail="游戏已结束")
-        
-        if game.current_player != AI_SYMBOL:
-            raise HTTPException(status_code=400, detail="现在不是AI的回合")
-        
-        ai_row, ai_col, ai_reasoning = llm_player.get_move(game)
-        
-        return JSONResponse(content={
+        async with state_lock:
+            if game.game_over:
+                raise HTTPException(status_code=400, detail="游戏已结束")
+
+            if game.current_player != AI_SYMBOL:
+                raise HTTPException(status_code=400, detail="现在不是AI的回合")
+
+            snapshot = game.clone()
+
+        ai_row, ai_col, ai_reasoning = await asyncio.to_thread(llm_player.get_move, snapshot)
+
+        return ORJSONResponse(content={
             "row": ai_row,
             "col": ai_col,
             "reasoning": ai_reasoning,
@@ -197,7 +247,7 @@ async def get_context_info():
     """获取LLM上下文信息"""
     try:
         context_info = llm_player.get_context_info()
-        return JSONResponse(content=context_info)
+        return ORJSONResponse(content=context_info)
     except Exception as e:
         logger.error(f"Error getting context info: {e}")
         raise HTTPException(status_code=500, detail=f"获取上下文信息失败: {str(e)}")
@@ -211,17 +261,29 @@ async def get_debug_info():
             raise HTTPException(status_code=404, detail="调试模式未启用")
 
         debug_info = llm_player.get_debug_info()
-        return JSONResponse(content=debug_info)
+        return ORJSONResponse(content=debug_info)
     except Exception as e:
         logger.error(f"Error getting debug info: {e}")
         raise HTTPException(status_code=500, detail=f"获取调试信息失败: {str(e)}")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """关闭时释放LLM客户端持有的HTTP连接池"""
+    client = getattr(llm_player, "llm_client", None)
+    inner = getattr(client, "client", None)  # LMStudioAdapter包装的LMStudioClient
+    if inner is not None:
+        if hasattr(inner, "aclose"):
+            await inner.aclose()
+        if hasattr(inner, "close"):
+            inner.close()
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """全局异常处理器"""
     logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"detail": f"服务器内部错误: {str(exc)}"}
     )
@@ -230,4 +292,12 @@ async def global_exception_handler(request: Request, exc: Exception):
 if __name__ == "__main__":
     import uvicorn
     logger.info(f"Starting LLMGomoku server on {HOST}:{PORT}")
-    uvicorn.run("main:app", host=HOST, port=PORT, reload=DEBUG)
+    # uvloop事件循环与httptools解析器（uvicorn[standard]自带）降低每请求
+    # 框架开销；uvloop不支持Windows时回退默认循环。
+    # 访问日志只在调试时开启，生产省去每请求一次的格式化与写出
+    uvicorn.run(
+        "main:app", host=HOST, port=PORT, reload=DEBUG,
+        loop="uvloop" if sys.platform != "win32" else "asyncio",
+        http="httptools",
+        access_log=DEBUG,
+    )
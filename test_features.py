@@ -10,10 +10,15 @@ import time
 
 BASE_URL = "http://127.0.0.1:8000"
 
+# 所有测试请求复用同一个会话，走keep-alive连接而非每次重新握手
+session = requests.Session()
+session.headers.update({"Connection": "keep-alive"})
+session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
 def test_game_state():
     """测试游戏状态API"""
     print("=== 测试游戏状态 ===")
-    response = requests.get(f"{BASE_URL}/api/game/state")
+    response = session.get(f"{BASE_URL}/api/game/state")
     if response.status_code == 200:
         data = response.json()
         print(f"游戏状态: {data.get('game_over', 'Unknown')}")
@@ -28,7 +33,7 @@ def test_game_state():
 def test_debug_info():
     """测试调试信息API"""
     print("\n=== 测试调试信息 ===")
-    response = requests.get(f"{BASE_URL}/api/game/debug")
+    response = session.get(f"{BASE_URL}/api/game/debug")
     if response.status_code == 200:
         data = response.json()
         print(f"调试模式启用: {data.get('debug_enabled', False)}")
@@ -48,7 +53,7 @@ def test_debug_info():
 def test_context_info():
     """测试上下文信息API"""
     print("\n=== 测试上下文信息 ===")
-    response = requests.get(f"{BASE_URL}/api/game/context")
+    response = session.get(f"{BASE_URL}/api/game/context")
     if response.status_code == 200:
         data = response.json()
         print(f"LLM提供商: {data.get('llm_provider', 'Unknown')}")
@@ -65,7 +70,7 @@ def test_make_move():
     print("\n=== 测试下棋功能 ===")
     
     # 先重置游戏
-    reset_response = requests.post(f"{BASE_URL}/api/game/reset")
+    reset_response = session.post(f"{BASE_URL}/api/game/reset")
     if reset_response.status_code != 200:
         print("重置游戏失败")
         return False
@@ -74,7 +79,7 @@ def test_make_move():
     
     # 玩家下棋 (中心位置)
     move_data = {"row": 7, "col": 7}
-    response = requests.post(f"{BASE_URL}/api/game/move", json=move_data)
+    response = session.post(f"{BASE_URL}/api/game/move", json=move_data)
     
     if response.status_code == 200:
         data = response.json()
@@ -100,7 +105,7 @@ def main():
     
     # 测试服务器连接
     try:
-        response = requests.get(f"{BASE_URL}/api/game/state", timeout=5)
+        response = session.get(f"{BASE_URL}/api/game/state", timeout=5)
         print("✓ 服务器连接正常")
     except requests.exceptions.RequestException as e:
         print(f"✗ 服务器连接失败: {e}")